@@ -1,12 +1,168 @@
 import google.generativeai as genai
+import copy
+import hashlib
 import json
 import os
+import re
+import string
+import threading
 import time
+import warnings
 import asyncio
-import concurrent.futures
-from typing import List, Dict, Any
+from cachetools import TTLCache
+from typing import List, Dict, Any, Optional
 from models import UserInterests
 
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib parser when orjson is unavailable
+    orjson = None
+
+def _json_loads(text: str) -> Any:
+    """Parse JSON text with orjson when available.
+    
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+    catch the stdlib exception either way.
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+# Leading ```json / ``` and trailing ``` fences around a model response
+_FENCE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$', re.S)
+
+# Successful responses keyed by a digest of the prompt that produced them
+_response_cache = TTLCache(maxsize=1024, ttl=3600)
+_response_cache_lock = threading.Lock()
+_response_cache_stats = {"hits": 0, "misses": 0}
+
+def _prompt_key(prompt: str) -> bytes:
+    """Short digest of a prompt, used as the response cache key"""
+    return hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest()
+
+def _cache_get(key: bytes) -> Optional[Any]:
+    """Return a private copy of a cached response, or None on a miss"""
+    with _response_cache_lock:
+        value = _response_cache.get(key)
+        _response_cache_stats["hits" if value is not None else "misses"] += 1
+    return copy.deepcopy(value) if value is not None else None
+
+def _cache_set(key: bytes, value: Any):
+    """Store a private copy of a response so callers cannot mutate the cache"""
+    with _response_cache_lock:
+        _response_cache[key] = copy.deepcopy(value)
+
+def clear_response_cache():
+    """Drop all cached responses, e.g. after new trending data is stored"""
+    with _response_cache_lock:
+        _response_cache.clear()
+
+def response_cache_info() -> dict:
+    """Hit/miss counters and current size of the response cache"""
+    with _response_cache_lock:
+        return {
+            **_response_cache_stats,
+            "size": _response_cache.currsize,
+            "maxsize": _response_cache.maxsize
+        }
+
+# Used when the model omits the profile section or the request fails
+DEFAULT_USER_INTERESTS = {
+    "primary_interests": ["lifestyle"],
+    "content_style": "casual",
+    "preferred_formats": ["photos"],
+    "audience_type": "general",
+    "tone": "personal"
+}
+
+# Prompt skeletons, filled in per request with Template.substitute
+_COMPLETE_PROMPT = string.Template("""Analyze this Instagram profile and return ONE complete JSON with ALL analysis:
+
+Bio: $bio
+Recent Posts:
+$captions
+Available Hashtags: $hashtags
+
+Return ONLY this EXACT JSON structure:
+{
+    "user_interests": {
+        "primary_interests": ["interest1", "interest2"],
+        "content_style": "casual/professional/artistic",
+        "preferred_formats": ["photos", "reels"],
+        "audience_type": "target audience",
+        "tone": "personal/inspirational/educational"
+    },
+    "matched_trends": [
+        {
+            "hashtag": "#hashtag1",
+            "match_score": 85,
+            "reasoning": "why it matches"
+        }
+    ],
+    "post_suggestions": [
+        {
+            "trend_hashtag": "#hashtag1",
+            "suggestions": ["idea 1", "idea 2"]
+        }
+    ]
+}
+
+IMPORTANT: Return ONLY the JSON above, no other text.""")
+
+_MATCH_PROMPT = string.Template("""Match hashtags to user profile:
+
+User: $interests, $style style, $audience audience
+
+Hashtags: $hashtags
+
+EXPECTED OUTPUT (copy this exact format):
+[
+    {"hashtag": "#fitness", "match_score": 85, "reasoning": "matches health interest"},
+    {"hashtag": "#lifestyle", "match_score": 70, "reasoning": "fits casual style"}
+]
+
+Return ONLY the JSON array above with scores >60. No extra text.""")
+
+_SUGGESTIONS_PROMPT = string.Template("""Generate post ideas for user profile:
+
+Style: $style
+Tone: $tone
+Hashtags: $hashtags
+
+EXPECTED OUTPUT (copy this exact format):
+[
+    {"trend_hashtag": "#fitness", "suggestions": ["Post idea 1 here", "Post idea 2 here"]},
+    {"trend_hashtag": "#lifestyle", "suggestions": ["Post idea 1 here", "Post idea 2 here"]}
+]
+
+Return ONLY the JSON array above. No extra text.""")
+
+_SIMPLE_SUGGESTIONS_PROMPT = string.Template("""
+        Generate 2-3 creative Instagram post ideas for each of these trending hashtags: $hashtags
+        
+        Provide a JSON array in this format:
+        [
+            {
+                "trend_hashtag": "#hashtag",
+                "suggestions": [
+                    "Creative post idea 1 that incorporates the hashtag naturally",
+                    "Creative post idea 2 with specific content suggestions",
+                    "Creative post idea 3 with engagement hooks"
+                ]
+            }
+        ]
+        
+        Make each suggestion engaging and trendy.
+        Provide only the JSON array, no additional text.
+        """)
+
+_HASHTAG_SUGGESTIONS_PROMPT = string.Template("""Generate 2-3 creative Instagram post ideas for the trending hashtag $hashtag
+
+Make each suggestion engaging and trendy.
+
+Return ONLY this JSON object:
+{"trend_hashtag": "$hashtag", "suggestions": ["Post idea 1", "Post idea 2", "Post idea 3"]}""")
+
 class GeminiClient:
     def __init__(self, api_key: str):
         genai.configure(api_key=api_key)
@@ -21,218 +177,156 @@ class GeminiClient:
             )
         )
     
-    def _make_request_with_retry(self, prompt: str, expected_format: str = "json", max_retries: int = 3) -> str:
-        """Make a request to Gemini with retry logic and format validation"""
+    @staticmethod
+    def _clean_response_text(response_text: str) -> str:
+        """Strip markdown code fences the model sometimes wraps JSON in"""
+        return _FENCE.sub('', response_text).strip()
+    
+    def _parse_response(self, response, expected_format: str) -> Any:
+        """Clean a response and parse it when JSON is expected; raises JSONDecodeError on bad JSON"""
+        response_text = self._clean_response_text(response.text)
+        print(f"📝 Raw response: {response_text[:150]}...")
+        
+        if expected_format != "json":
+            return response_text
+        
+        try:
+            parsed = _json_loads(response_text)
+        except json.JSONDecodeError as json_error:
+            print(f"❌ JSON validation failed: {json_error}")
+            print(f"Response was: {response_text[:200]}...")
+            raise
+        print("✅ Valid JSON format received")
+        return parsed
+    
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int, max_retries: int) -> int:
+        """Seconds to wait after a failed attempt; re-raises once no attempts are left"""
+        if isinstance(error, json.JSONDecodeError):
+            if attempt < max_retries - 1:
+                print("🔄 Retrying with corrected prompt...")
+                return 2
+            error = ValueError(f"Failed to get valid JSON after {max_retries} attempts")
+        
+        print(f"❌ Gemini API attempt {attempt + 1} failed: {error}")
+        if attempt >= max_retries - 1:
+            raise error
+        wait_time = 3 + (attempt * 2)  # 3, 5, 7 seconds
+        print(f"⏳ Waiting {wait_time} seconds before retry...")
+        return wait_time
+    
+    def _make_request_with_retry(self, prompt: str, expected_format: str = "json", max_retries: int = 3) -> Any:
+        """Make a request to Gemini with retry logic and format validation
+        
+        Returns the parsed JSON object when expected_format is "json",
+        otherwise the cleaned response text.
+        """
         for attempt in range(max_retries):
+            print(f"🤖 Gemini API attempt {attempt + 1}/{max_retries}...")
             try:
-                print(f"🤖 Gemini API attempt {attempt + 1}/{max_retries}...")
-                
-                # Make the request with optimized settings
                 response = self.model.generate_content(prompt)
-                response_text = response.text.strip()
-                
-                # Clean response text (remove markdown formatting if present)
-                if response_text.startswith('```json'):
-                    response_text = response_text.replace('```json', '').replace('```', '').strip()
-                elif response_text.startswith('```'):
-                    response_text = response_text.replace('```', '').strip()
-                
-                print(f"📝 Raw response: {response_text[:150]}...")
-                
-                # Validate JSON format if expected
-                if expected_format == "json":
-                    try:
-                        json.loads(response_text)
-                        print("✅ Valid JSON format received")
-                        return response_text
-                    except json.JSONDecodeError as json_error:
-                        print(f"❌ JSON validation failed: {json_error}")
-                        print(f"Response was: {response_text[:200]}...")
-                        if attempt < max_retries - 1:
-                            print("🔄 Retrying with corrected prompt...")
-                            time.sleep(2)
-                            continue
-                        else:
-                            raise ValueError(f"Failed to get valid JSON after {max_retries} attempts")
-                
-                return response_text
-                
+                return self._parse_response(response, expected_format)
             except Exception as e:
-                print(f"❌ Gemini API attempt {attempt + 1} failed: {e}")
-                if attempt < max_retries - 1:
-                    wait_time = 3 + (attempt * 2)  # 3, 5, 7 seconds
-                    print(f"⏳ Waiting {wait_time} seconds before retry...")
-                    time.sleep(wait_time)
-                else:
-                    raise e
+                time.sleep(self._retry_delay(e, attempt, max_retries))
     
-    def _process_requests_parallel(self, prompts: List[str]) -> List[str]:
-        """Process multiple Gemini requests in parallel using ThreadPoolExecutor"""
-        results = []
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            # Submit all requests
-            future_to_prompt = {
-                executor.submit(self._make_request_with_retry, prompt): prompt 
-                for prompt in prompts
-            }
-            
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(future_to_prompt, timeout=30):
-                try:
-                    result = future.result()
-                    results.append(result)
-                except Exception as e:
-                    print(f"Request failed: {e}")
-                    results.append("")  # Empty result for failed requests
-        
-        return results
+    async def _make_request_with_retry_async(self, prompt: str, expected_format: str = "json", max_retries: int = 3) -> Any:
+        """Async variant of _make_request_with_retry that does not block the event loop"""
+        for attempt in range(max_retries):
+            print(f"🤖 Gemini API attempt {attempt + 1}/{max_retries}...")
+            try:
+                response = await self.model.generate_content_async(prompt)
+                return self._parse_response(response, expected_format)
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(e, attempt, max_retries))
     
     def analyze_profile_fast(self, bio: str, post_captions: List[str], trending_hashtags: List[str]) -> tuple:
-        """Fast parallel analysis of profile, trend matching, and post suggestions"""
-        
-        # Limit to only 3 most recent captions for speed
-        captions = post_captions[:3]
-        captions_text = "\n".join([f"- {caption[:100]}..." if len(caption) > 100 else f"- {caption}" for caption in captions])
-        
-        # Create 3 optimized prompts for parallel processing
-        prompts = [
-            # Profile analysis prompt (shorter)
-            f"""Analyze this Instagram profile quickly:
-Bio: {bio[:200]}
-Recent posts: {captions_text}
-
-Return ONLY this JSON format:
-{{"primary_interests": ["list", "of", "interests"], "content_style": "style", "preferred_formats": ["formats"], "audience_type": "audience", "tone": "tone"}}""",
-            
-            # Trend matching prompt (top 10 trends only)
-            f"""Match these trends to a user interested in: {bio[:100]}
-Trends: {', '.join(trending_hashtags[:10])}
-
-Return ONLY this JSON array with top 5 matches:
-[{{"hashtag": "#tag", "match_score": 85, "reasoning": "brief reason"}}]""",
-            
-            # Post suggestions prompt (simplified)
-            f"""Generate 2 quick post ideas for each hashtag: {', '.join(trending_hashtags[:3])}
-Based on: {bio[:100]}
-
-Return ONLY this JSON:
-[{{"trend_hashtag": "#tag", "suggestions": ["idea1", "idea2"]}}]"""
-        ]
+        """Deprecated: use analyze_profile_complete, which does the same work in one request"""
+        warnings.warn(
+            "analyze_profile_fast is deprecated; use analyze_profile_complete",
+            DeprecationWarning,
+            stacklevel=2
+        )
+        result = self.analyze_profile_complete(bio, post_captions, trending_hashtags)
         
-        # Process all 3 requests in parallel
         try:
-            results = self._process_requests_parallel(prompts)
-            
-            # Parse results
+            user_interests = UserInterests(**result["user_interests"])
+        except Exception:
             user_interests = None
-            matched_trends = []
-            post_suggestions = []
-            
-            # Parse profile analysis
-            if results[0]:
-                try:
-                    profile_data = json.loads(results[0])
-                    user_interests = UserInterests(**profile_data)
-                except:
-                    pass
-            
-            # Parse trend matches
-            if results[1]:
-                try:
-                    matched_trends = json.loads(results[1])
-                except:
-                    pass
-            
-            # Parse post suggestions
-            if results[2]:
-                try:
-                    post_suggestions = json.loads(results[2])
-                except:
-                    pass
-            
-            return user_interests, matched_trends, post_suggestions
-            
-        except Exception as e:
-            print(f"Fast analysis failed: {e}")
-            return None, [], []
+        
+        return user_interests, result["matched_trends"], result["post_suggestions"]
     
-    def analyze_profile_complete(self, bio: str, post_captions: List[str], trending_hashtags: List[str]) -> dict:
-        """Complete profile analysis with ALL results in ONE API call"""
+    @staticmethod
+    def _complete_prompt(bio: str, post_captions: List[str], trending_hashtags: List[str]) -> str:
+        """Render the single-call analysis prompt"""
         
         # Limit data for faster processing
         captions_text = "\n".join([f"- {caption[:100]}" for caption in post_captions[:3]])
         hashtags_text = ", ".join(trending_hashtags[:10])
         
-        prompt = f"""Analyze this Instagram profile and return ONE complete JSON with ALL analysis:
-
-Bio: {bio[:200]}
-Recent Posts:
-{captions_text}
-Available Hashtags: {hashtags_text}
-
-Return ONLY this EXACT JSON structure:
-{{
-    "user_interests": {{
-        "primary_interests": ["interest1", "interest2"],
-        "content_style": "casual/professional/artistic",
-        "preferred_formats": ["photos", "reels"],
-        "audience_type": "target audience",
-        "tone": "personal/inspirational/educational"
-    }},
-    "matched_trends": [
-        {{
-            "hashtag": "#hashtag1",
-            "match_score": 85,
-            "reasoning": "why it matches"
-        }}
-    ],
-    "post_suggestions": [
-        {{
-            "trend_hashtag": "#hashtag1",
-            "suggestions": ["idea 1", "idea 2"]
-        }}
-    ]
-}}
-
-IMPORTANT: Return ONLY the JSON above, no other text."""
+        return _COMPLETE_PROMPT.substitute(bio=bio[:200], captions=captions_text, hashtags=hashtags_text)
+    
+    @staticmethod
+    def _complete_result(result: dict) -> dict:
+        """Fill in any section the model left out of a complete analysis"""
+        if "user_interests" not in result:
+            result["user_interests"] = copy.deepcopy(DEFAULT_USER_INTERESTS)
+        
+        if "matched_trends" not in result:
+            result["matched_trends"] = []
+        
+        if "post_suggestions" not in result:
+            result["post_suggestions"] = []
+        
+        return result
+    
+    @staticmethod
+    def _fallback_complete_result() -> dict:
+        """Complete analysis returned when Gemini could not be reached"""
+        return {
+            "user_interests": copy.deepcopy(DEFAULT_USER_INTERESTS),
+            "matched_trends": [],
+            "post_suggestions": []
+        }
+    
+    def analyze_profile_complete(self, bio: str, post_captions: List[str], trending_hashtags: List[str]) -> dict:
+        """Complete profile analysis with ALL results in ONE API call"""
+        prompt = self._complete_prompt(bio, post_captions, trending_hashtags)
+        
+        cache_key = _prompt_key(prompt)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            print("⚡ Returning cached complete analysis")
+            return cached
         
         try:
-            response_text = self._make_request_with_retry(prompt, expected_format="json")
-            result = json.loads(response_text)
-            
-            # Ensure all required fields exist
-            if "user_interests" not in result:
-                result["user_interests"] = {
-                    "primary_interests": ["lifestyle"],
-                    "content_style": "casual",
-                    "preferred_formats": ["photos"],
-                    "audience_type": "general",
-                    "tone": "personal"
-                }
-            
-            if "matched_trends" not in result:
-                result["matched_trends"] = []
-            
-            if "post_suggestions" not in result:
-                result["post_suggestions"] = []
+            result = self._complete_result(self._make_request_with_retry(prompt, expected_format="json"))
+            print(f"✅ Complete analysis successful: {len(result['matched_trends'])} trends, {len(result['post_suggestions'])} suggestions")
+            _cache_set(cache_key, result)
+            return result
             
+        except Exception as e:
+            print(f"❌ Error in complete analysis: {e}")
+            return self._fallback_complete_result()
+    
+    async def analyze_profile_complete_async(self, bio: str, post_captions: List[str], trending_hashtags: List[str]) -> dict:
+        """Async variant of analyze_profile_complete that does not block the event loop"""
+        prompt = self._complete_prompt(bio, post_captions, trending_hashtags)
+        
+        cache_key = _prompt_key(prompt)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            print("⚡ Returning cached complete analysis")
+            return cached
+        
+        try:
+            result = self._complete_result(await self._make_request_with_retry_async(prompt, expected_format="json"))
             print(f"✅ Complete analysis successful: {len(result['matched_trends'])} trends, {len(result['post_suggestions'])} suggestions")
+            _cache_set(cache_key, result)
             return result
             
         except Exception as e:
             print(f"❌ Error in complete analysis: {e}")
-            return {
-                "user_interests": {
-                    "primary_interests": ["lifestyle"],
-                    "content_style": "casual",
-                    "preferred_formats": ["photos"],
-                    "audience_type": "general",
-                    "tone": "personal"
-                },
-                "matched_trends": [],
-                "post_suggestions": []
-            }
+            return self._fallback_complete_result()
     
     def match_trends_to_interests(self, user_interests: UserInterests, trending_hashtags: List[str]) -> List[Dict[str, Any]]:
         """Match trending hashtags to user interests with enhanced format validation"""
@@ -242,25 +336,23 @@ IMPORTANT: Return ONLY the JSON above, no other text."""
         interests_text = ", ".join(user_interests.primary_interests)
         hashtags_text = ", ".join(limited_hashtags)
         
-        prompt = f"""Match hashtags to user profile:
-
-User: {interests_text}, {user_interests.content_style} style, {user_interests.audience_type} audience
-
-Hashtags: {hashtags_text}
-
-EXPECTED OUTPUT (copy this exact format):
-[
-    {{"hashtag": "#fitness", "match_score": 85, "reasoning": "matches health interest"}},
-    {{"hashtag": "#lifestyle", "match_score": 70, "reasoning": "fits casual style"}}
-]
-
-Return ONLY the JSON array above with scores >60. No extra text."""
+        prompt = _MATCH_PROMPT.substitute(
+            interests=interests_text,
+            style=user_interests.content_style,
+            audience=user_interests.audience_type,
+            hashtags=hashtags_text
+        )
+        
+        cache_key = _prompt_key(prompt)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return cached
         
         try:
-            response_text = self._make_request_with_retry(prompt, expected_format="json")
-            matches = json.loads(response_text)
+            matches = self._make_request_with_retry(prompt, expected_format="json")
             # Validate structure
             if isinstance(matches, list) and all(isinstance(m, dict) and 'hashtag' in m and 'match_score' in m for m in matches):
+                _cache_set(cache_key, matches)
                 return matches
             else:
                 print("Invalid match structure returned")
@@ -276,25 +368,22 @@ Return ONLY the JSON array above with scores >60. No extra text."""
         top_hashtags = matched_hashtags[:3]
         hashtags_text = ", ".join(top_hashtags)
         
-        prompt = f"""Generate post ideas for user profile:
-
-Style: {user_interests.content_style}
-Tone: {user_interests.tone}
-Hashtags: {hashtags_text}
-
-EXPECTED OUTPUT (copy this exact format):
-[
-    {{"trend_hashtag": "#fitness", "suggestions": ["Post idea 1 here", "Post idea 2 here"]}},
-    {{"trend_hashtag": "#lifestyle", "suggestions": ["Post idea 1 here", "Post idea 2 here"]}}
-]
-
-Return ONLY the JSON array above. No extra text."""
+        prompt = _SUGGESTIONS_PROMPT.substitute(
+            style=user_interests.content_style,
+            tone=user_interests.tone,
+            hashtags=hashtags_text
+        )
+        
+        cache_key = _prompt_key(prompt)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return cached
         
         try:
-            response_text = self._make_request_with_retry(prompt, expected_format="json")
-            suggestions = json.loads(response_text)
+            suggestions = self._make_request_with_retry(prompt, expected_format="json")
             # Validate structure
             if isinstance(suggestions, list) and all(isinstance(s, dict) and 'trend_hashtag' in s and 'suggestions' in s for s in suggestions):
+                _cache_set(cache_key, suggestions)
                 return suggestions
             else:
                 print("Invalid suggestions structure returned")
@@ -308,42 +397,45 @@ Return ONLY the JSON array above. No extra text."""
         
         hashtags_text = ", ".join(hashtags[:5])
         
-        prompt = f"""
-        Generate 2-3 creative Instagram post ideas for each of these trending hashtags: {hashtags_text}
-        
-        Provide a JSON array in this format:
-        [
-            {{
-                "trend_hashtag": "#hashtag",
-                "suggestions": [
-                    "Creative post idea 1 that incorporates the hashtag naturally",
-                    "Creative post idea 2 with specific content suggestions",
-                    "Creative post idea 3 with engagement hooks"
-                ]
-            }}
-        ]
-        
-        Make each suggestion engaging and trendy.
-        Provide only the JSON array, no additional text.
-        """
+        prompt = _SIMPLE_SUGGESTIONS_PROMPT.substitute(hashtags=hashtags_text)
         
         try:
-            response_text = self._make_request_with_retry(prompt)
-            suggestions = json.loads(response_text)
+            suggestions = self._make_request_with_retry(prompt)
             return suggestions
         except Exception as e:
             print(f"Error generating simple post suggestions: {e}")
             return []
 
+    async def generate_for_hashtag_async(self, hashtag: str) -> Dict[str, Any]:
+        """Generate post ideas for a single hashtag; raises if no valid ideas come back"""
+        prompt = _HASHTAG_SUGGESTIONS_PROMPT.substitute(hashtag=hashtag)
+        
+        cache_key = _prompt_key(prompt)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        suggestion = await self._make_request_with_retry_async(prompt, expected_format="json")
+        if not (isinstance(suggestion, dict) and isinstance(suggestion.get('suggestions'), list)):
+            raise ValueError(f"Invalid suggestions structure returned for {hashtag}")
+        
+        suggestion['trend_hashtag'] = hashtag
+        _cache_set(cache_key, suggestion)
+        return suggestion
+
 # Global client instance
 gemini_client = None
+_gemini_client_lock = threading.Lock()
 
 def get_gemini_client() -> GeminiClient:
     """Get Gemini client instance"""
     global gemini_client
     if gemini_client is None:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is required")
-        gemini_client = GeminiClient(api_key)
+        # Double-checked so genai.configure runs once even under concurrent first calls
+        with _gemini_client_lock:
+            if gemini_client is None:
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise ValueError("GEMINI_API_KEY environment variable is required")
+                gemini_client = GeminiClient(api_key)
     return gemini_client
@@ -1,7 +1,19 @@
 import instaloader
 from typing import List, Tuple, Optional
-import time
+import functools
+from itertools import islice
+import json
+import os
 import random
+import threading
+
+MOCK_FILE = os.path.join(os.path.dirname(__file__), "mock_data", "trending.json")
+
+@functools.lru_cache(maxsize=1)
+def _load_mock_trends() -> Tuple[dict, ...]:
+    """Read and parse the mock trending file once per process"""
+    with open(MOCK_FILE, 'r') as f:
+        return tuple(json.load(f).get("trends", []))
 
 class InstagramScraper:
     def __init__(self):
@@ -28,22 +40,12 @@ class InstagramScraper:
             # Get bio
             bio = profile.biography or ""
             
-            # Get recent post captions
-            captions = []
-            post_count = 0
-            
-            for post in profile.get_posts():
-                if post_count >= num_posts:
-                    break
-                
-                caption = post.caption or ""
-                if caption.strip():  # Only add non-empty captions
-                    captions.append(caption.strip())
-                
-                post_count += 1
-                
-                # Minimal delay for testing
-                time.sleep(0.1)
+            # Get recent post captions, skipping empty ones
+            recent_posts = islice(profile.get_posts(), num_posts)
+            captions = [
+                post.caption.strip() for post in recent_posts
+                if post.caption and post.caption.strip()
+            ]
             
             return bio, captions
             
@@ -61,15 +63,8 @@ class InstagramScraper:
         """
         # This is a placeholder - you would implement actual trending data fetching here
         # For now, we'll use the mock data from the JSON file
-        import json
-        import os
-        
-        mock_file = os.path.join(os.path.dirname(__file__), "mock_data", "trending.json")
-        
         try:
-            with open(mock_file, 'r') as f:
-                mock_data = json.load(f)
-                return mock_data.get("trends", [])
+            return list(_load_mock_trends())
         except FileNotFoundError:
             # Return some default trends if mock file doesn't exist
             return [
@@ -98,10 +93,13 @@ class InstagramScraper:
 
 # Global scraper instance
 instagram_scraper = None
+_instagram_scraper_lock = threading.Lock()
 
 def get_instagram_scraper() -> InstagramScraper:
     """Get Instagram scraper instance"""
     global instagram_scraper
     if instagram_scraper is None:
-        instagram_scraper = InstagramScraper()
+        with _instagram_scraper_lock:
+            if instagram_scraper is None:
+                instagram_scraper = InstagramScraper()
     return instagram_scraper
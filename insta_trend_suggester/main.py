@@ -1,46 +1,64 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from pydantic import TypeAdapter, ValidationError
+from typing import AsyncIterator, List, Optional
+import asyncio
+import hashlib
+import json
+import logging
 import os
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from models import (
     ProfileAnalysisRequest, ProfileAnalysisResponse, TrendsResponse, 
-    SuggestionsResponse, TrendItem, MatchedTrend, PostSuggestion, UserInterests
+    SuggestionsResponse, MatchedTrend, PostSuggestion, UserInterests
 )
-from db import get_database
-from gemini_utils import get_gemini_client
+from db import TRENDS_CACHE_SIZE, Database, get_database, init_database
+from gemini_utils import get_gemini_client, response_cache_info
 from instagram_scraper import get_instagram_scraper
 from scheduler import start_scheduler, stop_scheduler
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    print("Starting Instagram Trend Suggester API...")
+    logger.info("Starting Instagram Trend Suggester API...")
     
     # Initialize database
-    db = get_database()
-    print("Database initialized")
+    db = await init_database()
+    logger.info("Database initialized")
     
     # Start scheduler
     start_scheduler()
-    print("Scheduler started")
+    logger.info("Scheduler started")
     
     yield
     
     # Shutdown
-    print("Shutting down...")
+    logger.info("Shutting down...")
     stop_scheduler()
+    await db.dispose()
 
 # Create FastAPI app
 app = FastAPI(
     title="Instagram Trend Suggester API",
     description="AI-powered Instagram trend analysis and content suggestion system",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson encodes the nested response lists much faster than json.dumps
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
 )
 
 # Add CORS middleware
@@ -61,8 +79,114 @@ async def root():
         "status": "healthy"
     }
 
+async def get_db() -> Database:
+    """Database dependency; async so FastAPI resolves it without a threadpool hop"""
+    return get_database()
+
+# Batch validators for the lists returned by Gemini
+_MATCH_ADAPTER = TypeAdapter(List[MatchedTrend])
+_SUGG_ADAPTER = TypeAdapter(List[PostSuggestion])
+
+def _validate_items(adapter: TypeAdapter, items: List[dict], label: str) -> list:
+    """Validate a list in one pass, dropping only the items pydantic rejects"""
+    try:
+        return adapter.validate_python(items)
+    except ValidationError as e:
+        invalid = {error["loc"][0] for error in e.errors() if error["loc"]}
+        for index in sorted(invalid):
+            logger.warning("Skipping invalid %s: %s", label, items[index])
+        return adapter.validate_python([item for index, item in enumerate(items) if index not in invalid])
+
+def _unique_hashtags(hashtags: List[str], k: int = 15) -> List[str]:
+    """First k distinct hashtags, ignoring case and keeping the first spelling seen"""
+    unique = {}
+    for hashtag in hashtags:
+        unique.setdefault(hashtag.lower(), hashtag)
+        if len(unique) == k:
+            break
+    return list(unique.values())
+
+async def _latest_trending_hashtags(db: Database) -> List[str]:
+    """Hashtags of the current trends, or 503 if none have been fetched yet"""
+    # Several trending posts often share a hashtag; sending it to Gemini once
+    # keeps the prompt small and leaves room for more distinct trends
+    trending_hashtags = _unique_hashtags(
+        await db.get_cached_trend_hashtags(TRENDS_CACHE_SIZE),
+        k=15  # Reduced for faster processing
+    )
+    
+    if not trending_hashtags:
+        raise HTTPException(status_code=503, detail="No trending data available. Please try again later.")
+    return trending_hashtags
+
+def _sanitize_analysis(username: str, complete_analysis: dict) -> ProfileAnalysisResponse:
+    """Build a response from a malformed analysis, dropping only the bad items"""
+    try:
+        user_interests = UserInterests(**complete_analysis["user_interests"])
+    except Exception as e:
+        logger.error("Error in complete analysis: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error analyzing profile: {str(e)}")
+    
+    # Fill defaults in one pass, then validate each list once. Gemini
+    # sometimes returns explicit nulls, which get the same defaults as
+    # missing keys instead of failing validation.
+    matched_trends = _validate_items(_MATCH_ADAPTER, [
+        {
+            "hashtag": match.get("hashtag") or "Unknown",
+            "match_score": match.get("match_score") or 0,
+            "reasoning": match.get("reasoning") or "No reasoning provided"
+        }
+        for match in complete_analysis["matched_trends"] if isinstance(match, dict)
+    ], "match")
+    post_suggestions = _validate_items(_SUGG_ADAPTER, [
+        {
+            "trend_hashtag": suggestion.get("trend_hashtag") or "Unknown",
+            "suggestions": suggestion.get("suggestions") or []
+        }
+        for suggestion in complete_analysis["post_suggestions"] if isinstance(suggestion, dict)
+    ], "suggestion")
+    
+    return ProfileAnalysisResponse(
+        username=username,
+        user_interests=user_interests,
+        matched_trends=matched_trends,
+        post_suggestions=post_suggestions
+    )
+
+async def _run_analysis(db: Database, username: str, bio: str, captions: List[str], trending_hashtags: List[str]) -> ProfileAnalysisResponse:
+    """Analyze a profile against the trending hashtags and persist the matches"""
+    gemini = get_gemini_client()
+    
+    logger.info("Starting analysis for %s with %d trending hashtags...", username, len(trending_hashtags))
+    
+    # Use single comprehensive analysis call
+    try:
+        complete_analysis = await gemini.analyze_profile_complete_async(bio, captions, trending_hashtags)
+    except Exception as e:
+        logger.error("Error in complete analysis: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error analyzing profile: {str(e)}")
+    
+    # A well-formed analysis already has the response shape and is
+    # validated in one pass; anything else goes through item-level cleanup
+    try:
+        response = ProfileAnalysisResponse.model_validate({**complete_analysis, "username": username})
+    except ValidationError:
+        response = _sanitize_analysis(username, complete_analysis)
+    
+    logger.info("Analysis complete: %d trends, %d suggestions", len(response.matched_trends), len(response.post_suggestions))
+    
+    # Save the validated matches to database (only if we have results)
+    if response.matched_trends:
+        try:
+            await db.save_matched_trends(username, [match.model_dump() for match in response.matched_trends])
+            logger.info("Saved %d matched trends to database", len(response.matched_trends))
+        except Exception as e:
+            logger.warning("Could not save trends to database: %s", e)
+    
+    return response
+
 @app.post("/analyze-profile", response_model=ProfileAnalysisResponse)
-async def analyze_profile(request: ProfileAnalysisRequest):
+async def analyze_profile(request: ProfileAnalysisRequest, db: Database = Depends(get_db)):
     """
     Analyze an Instagram profile and provide trend suggestions
     
@@ -73,98 +197,76 @@ async def analyze_profile(request: ProfileAnalysisRequest):
     4. Generates personalized post suggestions
     """
     try:
-        # Get services
         scraper = get_instagram_scraper()
-        gemini = get_gemini_client()
-        db = get_database()
         
-        # Fetch Instagram profile data (reduced to 3 posts for speed)
-        try:
-            bio, post_captions = scraper.get_profile_data(request.username, 3)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error fetching Instagram data: {str(e)}")
+        # Fetch Instagram profile data (reduced to 3 posts for speed) and the
+        # current trending hashtags concurrently, off the event loop
+        profile_result, trending_hashtags = await asyncio.gather(
+            run_in_threadpool(scraper.get_profile_data, request.username, 3),
+            _latest_trending_hashtags(db),
+            return_exceptions=True
+        )
         
+        if isinstance(profile_result, Exception):
+            raise HTTPException(status_code=400, detail=f"Error fetching Instagram data: {str(profile_result)}")
+        if isinstance(trending_hashtags, Exception):
+            raise trending_hashtags
+        
+        bio, post_captions = profile_result
         if not bio and not post_captions:
             raise HTTPException(status_code=400, detail="No data found for this Instagram profile")
         
-        # Get current trending data
-        trending_data = db.get_latest_trends(limit=15)  # Reduced for faster processing
-        trending_hashtags = [trend.hashtag for trend in trending_data]
-        
-        if not trending_hashtags:
-            raise HTTPException(status_code=503, detail="No trending data available. Please try again later.")
-        
-        # Use single comprehensive analysis call
-        try:
-            complete_analysis = gemini.analyze_profile_complete(bio, post_captions, trending_hashtags)
-            
-            # Extract results from single response
-            user_interests = UserInterests(**complete_analysis["user_interests"])
-            trend_matches = complete_analysis["matched_trends"]
-            post_suggestions_raw = complete_analysis["post_suggestions"]
-            
-            print(f"✅ Analysis complete: {len(trend_matches)} trends, {len(post_suggestions_raw)} suggestions")
-            
-        except Exception as e:
-            print(f"❌ Error in complete analysis: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error analyzing profile: {str(e)}")
-        
-        # Save matched trends to database (only if we have results)
-        if trend_matches:
-            try:
-                db.save_matched_trends(request.username, trend_matches)
-                print(f"💾 Saved {len(trend_matches)} matched trends to database")
-            except Exception as e:
-                print(f"⚠️ Warning: Could not save trends to database: {e}")
-        
-        # Format response with better error handling
-        matched_trends = []
-        for match in trend_matches:
-            try:
-                matched_trends.append(MatchedTrend(
-                    hashtag=match.get('hashtag', 'Unknown'),
-                    match_score=float(match.get('match_score', 0)),
-                    reasoning=match.get('reasoning', 'No reasoning provided')
-                ))
-            except Exception as e:
-                print(f"⚠️ Skipping invalid match: {match}, Error: {e}")
-                continue
-        
-        post_suggestions = []
-        for suggestion in post_suggestions_raw:
-            try:
-                post_suggestions.append(PostSuggestion(
-                    trend_hashtag=suggestion.get('trend_hashtag', 'Unknown'),
-                    suggestions=suggestion.get('suggestions', [])
-                ))
-            except Exception as e:
-                print(f"⚠️ Skipping invalid suggestion: {suggestion}, Error: {e}")
-                continue
-                continue
-        
-        return ProfileAnalysisResponse(
-            username=request.username,
-            user_interests=user_interests,
-            matched_trends=matched_trends,
-            post_suggestions=post_suggestions
-        )
+        return await _run_analysis(db, request.username, bio, post_captions, trending_hashtags)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Trends are refreshed by the scheduler every 30 minutes
+TRENDS_CACHE_CONTROL = "public, max-age=1800"
+# Suggestions change whenever the profile is re-analyzed, so clients revalidate
+SUGGESTIONS_CACHE_CONTROL = "private, no-cache"
+
+def _etag(version, weak: bool = False) -> str:
+    """ETag for a resource version such as its last modification time.
+    
+    Use a weak ETag when the same version can be rendered as different bytes.
+    """
+    tag = '"%s"' % hashlib.blake2b(str(version).encode(), digest_size=8).hexdigest()
+    return "W/" + tag if weak else tag
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header already names the current ETag"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        # GET revalidation uses weak comparison, so W/ prefixes are ignored
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in ("*", etag[2:] if etag.startswith("W/") else etag):
+            return True
+    return False
+
 @app.get("/suggestions/{username}", response_model=SuggestionsResponse)
-async def get_suggestions(username: str):
+async def get_suggestions(
+    username: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Database = Depends(get_db)
+):
     """
     Get cached suggestions for a previously analyzed username
+    
+    Responses carry an ETag derived from the time of the last analysis, so
+    clients can revalidate without triggering new Gemini requests.
     """
     try:
-        db = get_database()
         gemini = get_gemini_client()
         
         # Get matched trends from database
-        matched_trends_db = db.get_matched_trends(username)
+        matched_trends_db = await db.get_cached_matched_trends(username)
         
         if not matched_trends_db:
             raise HTTPException(
@@ -172,9 +274,16 @@ async def get_suggestions(username: str):
                 detail=f"No analysis found for username '{username}'. Please analyze the profile first."
             )
         
-        # Format matched trends
+        # Every save rewrites created_at for all of the user's matches
+        # Weak: post_suggestions are regenerated once Gemini's response cache
+        # expires, so the same analysis can produce a different body
+        etag = _etag(max(match.created_at for match in matched_trends_db), weak=True)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": SUGGESTIONS_CACHE_CONTROL})
+        
+        # Rows come from typed columns, so skip re-validating them
         matched_trends = [
-            MatchedTrend(
+            MatchedTrend.model_construct(
                 hashtag=match.hashtag,
                 match_score=match.match_score,
                 reasoning=match.reasoning
@@ -182,25 +291,29 @@ async def get_suggestions(username: str):
             for match in matched_trends_db
         ]
         
-        # Generate fresh post suggestions based on cached matches
+        # Generate fresh post suggestions based on cached matches, one
+        # concurrent Gemini request per hashtag. User interests are not
+        # stored, so these use a simplified prompt without them.
         hashtags = [match.hashtag for match in matched_trends_db[:5]]
+        results = await asyncio.gather(
+            *[gemini.generate_for_hashtag_async(hashtag) for hashtag in hashtags],
+            return_exceptions=True
+        )
         
-        # We need user interests to generate suggestions, but they're not stored
-        # For this endpoint, we'll use a simplified approach
-        try:
-            # Use a simplified prompt for post generation without full user analysis
-            post_suggestions_raw = gemini.generate_post_suggestions_simple(hashtags)
-            
-            post_suggestions = [
-                PostSuggestion(
-                    trend_hashtag=suggestion['trend_hashtag'],
-                    suggestions=suggestion['suggestions']
-                )
-                for suggestion in post_suggestions_raw
-            ]
-        except:
-            # Fallback to empty suggestions if generation fails
-            post_suggestions = []
+        # Hashtags whose generation failed are left out of the response
+        for hashtag, result in zip(hashtags, results):
+            if isinstance(result, Exception):
+                logger.warning("Could not generate suggestions for %s: %s", hashtag, result)
+        post_suggestions = _validate_items(
+            _SUGG_ADAPTER,
+            [result for result in results if not isinstance(result, Exception)],
+            "suggestion"
+        )
+        
+        # Only a complete response is worth revalidating against later
+        if not any(isinstance(result, Exception) for result in results):
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = SUGGESTIONS_CACHE_CONTROL
         
         return SuggestionsResponse(
             matched_trends=matched_trends,
@@ -212,34 +325,56 @@ async def get_suggestions(username: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+def _dump_json(value) -> bytes:
+    """Serialize plain rows to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=lambda v: v.isoformat(), separators=(",", ":")).encode()
+
+async def _stream_trends(first_batch: List[dict], batches: AsyncIterator[List[dict]]):
+    """Write a TrendsResponse body one batch of rows at a time"""
+    try:
+        yield b'{"trends":['
+        total_count = 0
+        if first_batch:
+            yield _dump_json(first_batch)[1:-1]
+            total_count = len(first_batch)
+            async for batch in batches:
+                yield b"," + _dump_json(batch)[1:-1]
+                total_count += len(batch)
+        yield b'],"total_count":%d}' % total_count
+    finally:
+        await batches.aclose()
+
 @app.get("/trends", response_model=TrendsResponse)
-async def get_trends(limit: int = 50):
+async def get_trends(
+    limit: int = Query(50, ge=0),
+    offset: int = Query(0, ge=0),
+    if_none_match: Optional[str] = Header(None),
+    db: Database = Depends(get_db)
+):
     """
     Get current trending Instagram data
+    
+    Rows are paginated in SQL and streamed to the client as they are read,
+    so large limits do not materialize the whole result. The ETag follows
+    the last fetch time, which changes whenever new trends are stored.
     """
     try:
-        db = get_database()
-        trending_data = db.get_latest_trends(limit=limit)
-        
-        trends = [
-            TrendItem(
-                hashtag=trend.hashtag,
-                caption=trend.caption,
-                post_url=trend.post_url,
-                likes=trend.likes,
-                comments=trend.comments,
-                fetched_at=trend.fetched_at
-            )
-            for trend in trending_data
-        ]
-        
-        return TrendsResponse(
-            trends=trends,
-            total_count=len(trends)
-        )
-        
+        etag = _etag(await db.get_last_fetch_time())
+        headers = {"ETag": etag, "Cache-Control": TRENDS_CACHE_CONTROL}
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        
+        batches = db.stream_latest_trends(limit=limit, offset=offset)
+        # Run the query before the response starts so errors still map to a 500
+        first_batch = await batches.__anext__()
+    except StopAsyncIteration:
+        first_batch = []
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching trends: {str(e)}")
+    
+    return StreamingResponse(_stream_trends(first_batch, batches), media_type="application/json", headers=headers)
 
 @app.get("/health")
 async def health_check():
@@ -247,7 +382,7 @@ async def health_check():
     try:
         # Check database connection
         db = get_database()
-        db.get_latest_trends(limit=1)
+        await db.ping()
         db_status = "healthy"
     except Exception as e:
         db_status = f"error: {str(e)}"
@@ -263,11 +398,12 @@ async def health_check():
         "status": "running",
         "database": db_status,
         "gemini_api": gemini_status,
-        "scheduler": "running"
+        "scheduler": "running",
+        "analysis_cache": response_cache_info()
     }
 
 @app.post("/demo-analysis", response_model=ProfileAnalysisResponse)
-async def demo_analysis():
+async def demo_analysis(db: Database = Depends(get_db)):
     """
     Demo endpoint using sample Instagram data to test Gemini API integration
     """
@@ -279,69 +415,9 @@ async def demo_analysis():
             "Just Another Sunday, But Better ☀️ #WeekendVibes #SundayMood #ChillDay",
             "Sometimes you just need a little chaos to feel alive. 😁🎢 #LifePhilosophy #Adventure"
         ]
-        username = "demo_user"
-        
-        # Get services
-        gemini = get_gemini_client()
-        db = get_database()
-        
-        # Get current trending data
-        trending_data = db.get_latest_trends(limit=15)
-        trending_hashtags = [trend.hashtag for trend in trending_data]
         
-        if not trending_hashtags:
-            raise HTTPException(status_code=503, detail="No trending data available. Please try again later.")
-        
-        # Use single comprehensive analysis call
-        print(f"🚀 Starting demo analysis with {len(trending_hashtags)} trending hashtags...")
-        
-        complete_analysis = gemini.analyze_profile_complete(sample_bio, sample_captions, trending_hashtags)
-        
-        # Extract results from single response
-        user_interests = UserInterests(**complete_analysis["user_interests"])
-        trend_matches = complete_analysis["matched_trends"]
-        post_suggestions_raw = complete_analysis["post_suggestions"]
-        
-        print(f"✅ Demo analysis complete: {len(trend_matches)} trends, {len(post_suggestions_raw)} suggestions")
-        
-        # Save matched trends to database (only if we have results)
-        if trend_matches:
-            try:
-                db.save_matched_trends(username, trend_matches)
-                print(f"💾 Saved {len(trend_matches)} matched trends to database")
-            except Exception as e:
-                print(f"⚠️ Warning: Could not save trends to database: {e}")
-        
-        # Format response with better error handling
-        matched_trends = []
-        for match in trend_matches:
-            try:
-                matched_trends.append(MatchedTrend(
-                    hashtag=match.get('hashtag', 'Unknown'),
-                    match_score=float(match.get('match_score', 0)),
-                    reasoning=match.get('reasoning', 'No reasoning provided')
-                ))
-            except Exception as e:
-                print(f"⚠️ Skipping invalid match: {match}, Error: {e}")
-                continue
-        
-        post_suggestions = []
-        for suggestion in post_suggestions_raw:
-            try:
-                post_suggestions.append(PostSuggestion(
-                    trend_hashtag=suggestion.get('trend_hashtag', 'Unknown'),
-                    suggestions=suggestion.get('suggestions', [])
-                ))
-            except Exception as e:
-                print(f"⚠️ Skipping invalid suggestion: {suggestion}, Error: {e}")
-                continue
-        
-        return ProfileAnalysisResponse(
-            username=username,
-            user_interests=user_interests,
-            matched_trends=matched_trends,
-            post_suggestions=post_suggestions
-        )
+        trending_hashtags = await _latest_trending_hashtags(db)
+        return await _run_analysis(db, "demo_user", sample_bio, sample_captions, trending_hashtags)
         
     except HTTPException:
         raise
@@ -349,7 +425,7 @@ async def demo_analysis():
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.post("/test-cristiano", response_model=ProfileAnalysisResponse)
-async def test_cristiano_analysis():
+async def test_cristiano_analysis(db: Database = Depends(get_db)):
     """
     Test endpoint using Cristiano Ronaldo's actual profile data to demonstrate the full AI flow
     """
@@ -361,69 +437,9 @@ async def test_cristiano_analysis():
             "Family time is the best time ❤️👨‍👩‍👧‍👦 Blessed to have these amazing people in my life #Family #Blessed #Love",
             "Training hard every single day 💪 Age is just a number when you have passion and dedication #NeverGiveUp #Training #Football"
         ]
-        username = "cristiano"
-        
-        # Get services
-        gemini = get_gemini_client()
-        db = get_database()
         
-        # Get current trending data
-        trending_data = db.get_latest_trends(limit=15)
-        trending_hashtags = [trend.hashtag for trend in trending_data]
-        
-        if not trending_hashtags:
-            raise HTTPException(status_code=503, detail="No trending data available. Please try again later.")
-        
-        # Use single comprehensive analysis call
-        print(f"🚀 Starting Cristiano analysis with {len(trending_hashtags)} trending hashtags...")
-        
-        complete_analysis = gemini.analyze_profile_complete(cristiano_bio, cristiano_captions, trending_hashtags)
-        
-        # Extract results from single response
-        user_interests = UserInterests(**complete_analysis["user_interests"])
-        trend_matches = complete_analysis["matched_trends"]
-        post_suggestions_raw = complete_analysis["post_suggestions"]
-        
-        print(f"✅ Cristiano analysis complete: {len(trend_matches)} trends, {len(post_suggestions_raw)} suggestions")
-        
-        # Save matched trends to database (only if we have results)
-        if trend_matches:
-            try:
-                db.save_matched_trends(username, trend_matches)
-                print(f"💾 Saved {len(trend_matches)} matched trends for Cristiano to database")
-            except Exception as e:
-                print(f"⚠️ Warning: Could not save trends to database: {e}")
-        
-        # Format response with better error handling
-        matched_trends = []
-        for match in trend_matches:
-            try:
-                matched_trends.append(MatchedTrend(
-                    hashtag=match.get('hashtag', 'Unknown'),
-                    match_score=float(match.get('match_score', 0)),
-                    reasoning=match.get('reasoning', 'No reasoning provided')
-                ))
-            except Exception as e:
-                print(f"⚠️ Skipping invalid match: {match}, Error: {e}")
-                continue
-        
-        post_suggestions = []
-        for suggestion in post_suggestions_raw:
-            try:
-                post_suggestions.append(PostSuggestion(
-                    trend_hashtag=suggestion.get('trend_hashtag', 'Unknown'),
-                    suggestions=suggestion.get('suggestions', [])
-                ))
-            except Exception as e:
-                print(f"⚠️ Skipping invalid suggestion: {suggestion}, Error: {e}")
-                continue
-        
-        return ProfileAnalysisResponse(
-            username=username,
-            user_interests=user_interests,
-            matched_trends=matched_trends,
-            post_suggestions=post_suggestions
-        )
+        trending_hashtags = await _latest_trending_hashtags(db)
+        return await _run_analysis(db, "cristiano", cristiano_bio, cristiano_captions, trending_hashtags)
         
     except HTTPException:
         raise
@@ -431,14 +447,13 @@ async def test_cristiano_analysis():
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.post("/test-celebrating-utsav", response_model=ProfileAnalysisResponse)
-async def test_celebrating_utsav():
+async def test_celebrating_utsav(db: Database = Depends(get_db)):
     """
     Test endpoint for celebrating_utsav using actual scraped data
     This bypasses Instagram API authentication issues
     """
     try:
         # Real data we successfully scraped earlier
-        username = "celebrating_utsav"
         bio = "Bios are overrated Skip the assumptions - meet me in person"
         captions = [
             "Le Chat GPT when the prompt is: 'Suggest a house design inspired from my life story.' 🏠😂 #TechHumor #AILife #Architecture #CreativeThinking",
@@ -446,69 +461,8 @@ async def test_celebrating_utsav():
             "Sometimes you just need a little chaos to feel alive. 😁🎢 Saarburg, thanks for the memories! #Adventure #LifePhilosophy #Travel #Germany #Memories"
         ]
         
-        # Get services
-        gemini = get_gemini_client()
-        db = get_database()
-        
-        # Get current trending data
-        trending_data = db.get_latest_trends(limit=15)
-        trending_hashtags = [trend.hashtag for trend in trending_data]
-        
-        if not trending_hashtags:
-            raise HTTPException(status_code=503, detail="No trending data available. Please try again later.")
-        
-        print(f"🚀 Starting analysis for {username} with {len(trending_hashtags)} trending hashtags...")
-        print(f"📝 Bio: {bio}")
-        print(f"📸 Posts: {len(captions)} captions")
-        
-        # Use single comprehensive analysis call
-        complete_analysis = gemini.analyze_profile_complete(bio, captions, trending_hashtags)
-        
-        # Extract results from single response
-        user_interests = UserInterests(**complete_analysis["user_interests"])
-        trend_matches = complete_analysis["matched_trends"]
-        post_suggestions_raw = complete_analysis["post_suggestions"]
-        
-        print(f"✅ Analysis complete: {len(trend_matches)} trends, {len(post_suggestions_raw)} suggestions")
-        
-        # Save matched trends to database
-        if trend_matches:
-            try:
-                db.save_matched_trends(username, trend_matches)
-                print(f"💾 Saved {len(trend_matches)} matched trends to database")
-            except Exception as e:
-                print(f"⚠️ Warning: Could not save trends to database: {e}")
-        
-        # Format response with better error handling
-        matched_trends = []
-        for match in trend_matches:
-            try:
-                matched_trends.append(MatchedTrend(
-                    hashtag=match.get('hashtag', 'Unknown'),
-                    match_score=float(match.get('match_score', 0)),
-                    reasoning=match.get('reasoning', 'No reasoning provided')
-                ))
-            except Exception as e:
-                print(f"⚠️ Skipping invalid match: {match}, Error: {e}")
-                continue
-        
-        post_suggestions = []
-        for suggestion in post_suggestions_raw:
-            try:
-                post_suggestions.append(PostSuggestion(
-                    trend_hashtag=suggestion.get('trend_hashtag', 'Unknown'),
-                    suggestions=suggestion.get('suggestions', [])
-                ))
-            except Exception as e:
-                print(f"⚠️ Skipping invalid suggestion: {suggestion}, Error: {e}")
-                continue
-        
-        return ProfileAnalysisResponse(
-            username=username,
-            user_interests=user_interests,
-            matched_trends=matched_trends,
-            post_suggestions=post_suggestions
-        )
+        trending_hashtags = await _latest_trending_hashtags(db)
+        return await _run_analysis(db, "celebrating_utsav", bio, captions, trending_hashtags)
         
     except HTTPException:
         raise
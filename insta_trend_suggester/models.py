@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, create_engine, MetaData
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Index, UniqueConstraint, create_engine, MetaData
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -10,17 +10,31 @@ Base = declarative_base()
 # Database Models
 class TrendingData(Base):
     __tablename__ = "trending_data"
+    __table_args__ = (
+        # Backs the (hashtag, caption) de-duplication lookup in insert_trending_data.
+        # Keyed on the caption's digest: long captions exceed the btree row limit
+        UniqueConstraint("hashtag", "caption_hash", name="uq_trending_hashtag_caption_hash"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     hashtag = Column(String(255), nullable=False)
     caption = Column(Text, nullable=False)
+    # MD5 hex digest of caption, the same value as PostgreSQL's md5(caption)
+    caption_hash = Column(String(32), nullable=False)
     post_url = Column(String(255), nullable=True)
     likes = Column(Integer, default=0)
     comments = Column(Integer, default=0)
     fetched_at = Column(DateTime, default=datetime.utcnow)
 
+# Serves the newest-first reads and the MAX(fetched_at) freshness check
+Index("ix_trending_fetched_at", TrendingData.fetched_at.desc())
+
 class MatchedTrends(Base):
     __tablename__ = "matched_trends"
+    __table_args__ = (
+        # Conflict target for the upsert in save_matched_trends
+        UniqueConstraint("username", "hashtag", name="uq_matched_username_hashtag"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(100), nullable=False)
@@ -29,6 +43,9 @@ class MatchedTrends(Base):
     reasoning = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# Serves get_matched_trends: filter by username, best score first
+Index("ix_matched_user_score", MatchedTrends.username, MatchedTrends.match_score.desc())
+
 # Pydantic Models
 class ProfileAnalysisRequest(BaseModel):
     username: str
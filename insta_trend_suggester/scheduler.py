@@ -1,8 +1,10 @@
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-import atexit
+import asyncio
+from datetime import datetime
 from db import get_database
 from instagram_scraper import get_instagram_scraper
+from gemini_utils import clear_response_cache
 import logging
 
 # Configure logging
@@ -11,29 +13,38 @@ logger = logging.getLogger(__name__)
 
 class TrendScheduler:
     def __init__(self):
-        self.scheduler = BackgroundScheduler()
+        # Runs jobs on the application's event loop; start() must be called
+        # from inside that loop (the FastAPI lifespan)
+        self.scheduler = AsyncIOScheduler()
         self.db = get_database()
         self.scraper = get_instagram_scraper()
         
-    def fetch_and_store_trends(self):
+    async def fetch_and_store_trends(self):
         """Fetch trending data and store in database"""
+        # The scraper is blocking, so it is handed to the loop's executor
+        # instead of running on the loop
+        loop = asyncio.get_running_loop()
         try:
             logger.info("Checking if trends need to be fetched...")
             
             # Check if we need to fetch trends (last fetch > 1 hour ago)
-            if not self.db.should_fetch_trends():
+            if not await self.db.should_fetch_trends():
                 logger.info("Trends are still fresh, skipping fetch")
                 return
             
             logger.info("Fetching new trending data...")
             
             # Get trending hashtags (using mock data for now)
-            trends = self.scraper.get_trending_hashtags_mock()
+            trends = await loop.run_in_executor(None, self.scraper.get_trending_hashtags_mock)
             
             if trends:
                 # Store in database
-                self.db.insert_trending_data(trends)
+                inserted = await self.db.insert_trending_data(trends)
                 logger.info(f"Successfully stored {len(trends)} trending items")
+                
+                # Cached analyses were built against the previous trend set
+                if inserted:
+                    clear_response_cache()
             else:
                 logger.warning("No trending data retrieved")
                 
@@ -42,33 +53,35 @@ class TrendScheduler:
     
     def start(self):
         """Start the scheduler"""
+        # Starting twice (e.g. a repeated lifespan startup) would raise
+        if self.scheduler.running:
+            return
+        
         try:
-            # Add job to run every 30 minutes
+            # Add job to run every 30 minutes, starting immediately to populate
+            # data; the first run is scheduled rather than awaited so it does
+            # not hold up application startup
             self.scheduler.add_job(
                 func=self.fetch_and_store_trends,
                 trigger=IntervalTrigger(minutes=30),
                 id='fetch_trends',
                 name='Fetch trending Instagram data',
-                replace_existing=True
+                replace_existing=True,
+                next_run_time=datetime.now()
             )
             
-            # Run once immediately to populate data
-            self.fetch_and_store_trends()
-            
             # Start the scheduler
             self.scheduler.start()
             logger.info("Trend scheduler started successfully")
             
-            # Shut down the scheduler when exiting the app
-            atexit.register(lambda: self.scheduler.shutdown())
-            
         except Exception as e:
             logger.error(f"Error starting scheduler: {e}")
     
     def stop(self):
-        """Stop the scheduler"""
+        """Stop the scheduler; called from the application lifespan"""
         if self.scheduler.running:
-            self.scheduler.shutdown()
+            # Don't wait for a running fetch; the lifespan is on the event loop
+            self.scheduler.shutdown(wait=False)
             logger.info("Trend scheduler stopped")
 
 # Global scheduler instance
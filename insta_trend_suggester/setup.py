@@ -4,52 +4,30 @@ Setup script for the Instagram Trend Suggester project.
 This script helps you configure the project and test basic functionality.
 """
 
+import functools
+import io
 import os
+import string
 import sys
-import asyncio
 from pathlib import Path
 
-# Add the project directory to Python path
+# Add the project directory to Python path, once even if re-imported
 project_dir = Path(__file__).parent
-sys.path.insert(0, str(project_dir))
+if str(project_dir) not in sys.path:
+    sys.path.insert(0, str(project_dir))
 
-def create_env_file():
-    """Create a .env file with required environment variables."""
-    env_file = project_dir / ".env"
-    
-    if env_file.exists():
-        print("✓ .env file already exists")
-        return
-    
-    print("Creating .env file...")
-    
-    # Get user input for environment variables
-    gemini_api_key = input("Enter your Gemini API Key (get it from https://makersuite.google.com/app/apikey): ")
-    
-    print("\nDatabase connection options:")
-    print("1. Local PostgreSQL (recommended for development)")
-    print("2. Cloud PostgreSQL (Supabase, AWS RDS, etc.)")
-    print("3. Use SQLite for testing (simpler setup)")
-    
-    db_choice = input("Choose database option (1-3): ").strip()
-    
-    if db_choice == "3":
-        db_url = "sqlite:///./instagram_trends.db"
-    elif db_choice == "1":
-        db_user = input("PostgreSQL username (default: postgres): ").strip() or "postgres"
-        db_password = input("PostgreSQL password: ")
-        db_host = input("PostgreSQL host (default: localhost): ").strip() or "localhost"
-        db_port = input("PostgreSQL port (default: 5432): ").strip() or "5432"
-        db_name = input("Database name (default: instagram_trends): ").strip() or "instagram_trends"
-        db_url = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    else:
-        db_url = input("Enter your PostgreSQL connection URL: ")
-    
-    env_content = f"""# Gemini API Configuration
-GEMINI_API_KEY={gemini_api_key}
+@functools.lru_cache(maxsize=1)
+def _load_env():
+    """Load .env into the environment once per run"""
+    from dotenv import load_dotenv
+    return load_dotenv()
+
+# Contents of a freshly created .env file
+ENV_TEMPLATE = string.Template("""# Gemini API Configuration
+GEMINI_API_KEY=$gemini_api_key
 
 # Database Configuration
-DATABASE_URL={db_url}
+DATABASE_URL=$db_url
 
 # Optional: Instagram credentials (for real scraping instead of mock data)
 # INSTAGRAM_USERNAME=your_username
@@ -59,114 +37,223 @@ DATABASE_URL={db_url}
 API_HOST=localhost
 API_PORT=8000
 DEBUG=true
-"""
+""")
+
+# Smallest request that proves the API key and model work
+PROBE_PROMPT = "Reply with the single word: ok"
+
+def _read_config(text):
+    """Parse KEY=VALUE settings (the .env format) into the environment"""
+    from dotenv import dotenv_values
+    # Variables already set in the environment take precedence
+    for key, value in dotenv_values(stream=io.StringIO(text)).items():
+        if value is not None:
+            os.environ.setdefault(key, value)
+
+def _setting(prompt, env_var=None, default="", interactive=True):
+    """Read a setting from the environment, prompting only when interactive"""
+    value = os.getenv(env_var) if env_var else None
+    if value is None and interactive:
+        value = input(prompt).strip()
+    return value or default
+
+def create_env_file(interactive=True):
+    """Create a .env file with required environment variables, returning whether one exists."""
+    env_file = project_dir / ".env"
     
-    with open(env_file, "w") as f:
-        f.write(env_content)
+    if env_file.exists():
+        print("✓ .env file already exists")
+        return True
+    
+    print("Creating .env file...")
+    
+    # Get user input for environment variables; values already set in the
+    # environment are used as-is
+    gemini_api_key = _setting(
+        "Enter your Gemini API Key (get it from https://makersuite.google.com/app/apikey): ",
+        "GEMINI_API_KEY", interactive=interactive
+    )
+    
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        if interactive and not os.getenv("DB_CHOICE"):
+            print("\nDatabase connection options:")
+            print("1. Local PostgreSQL (recommended for development)")
+            print("2. Cloud PostgreSQL (Supabase, AWS RDS, etc.)")
+            print("3. Use SQLite for testing (simpler setup)")
+        
+        # Without a terminal, fall back to the SQLite option that needs no server
+        db_choice = _setting("Choose database option (1-3): ", "DB_CHOICE", "3", interactive)
+        
+        if db_choice == "3":
+            db_url = "sqlite:///./instagram_trends.db"
+        elif db_choice == "1":
+            db_user = _setting("PostgreSQL username (default: postgres): ", "DB_USER", default="postgres", interactive=interactive)
+            db_password = _setting("PostgreSQL password: ", "DB_PASSWORD", interactive=interactive)
+            db_host = _setting("PostgreSQL host (default: localhost): ", "DB_HOST", default="localhost", interactive=interactive)
+            db_port = _setting("PostgreSQL port (default: 5432): ", "DB_PORT", default="5432", interactive=interactive)
+            db_name = _setting("Database name (default: instagram_trends): ", "DB_NAME", default="instagram_trends", interactive=interactive)
+            db_url = f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+        else:
+            db_url = _setting("Enter your PostgreSQL connection URL: ", interactive=interactive)
+    
+    # Without a terminal nothing can be asked, so never write a file that
+    # later runs would accept as configured
+    missing = [name for name, value in (("GEMINI_API_KEY", gemini_api_key), ("DATABASE_URL", db_url)) if not value]
+    if missing and not interactive:
+        print(f"✗ .env file not created: set {' and '.join(missing)} in the environment or --config file")
+        return False
+    
+    env_file.write_text(ENV_TEMPLATE.substitute(gemini_api_key=gemini_api_key, db_url=db_url))
     
     print(f"✓ Created .env file at {env_file}")
     print("⚠️  Make sure to keep your .env file secure and never commit it to version control!")
+    return True
 
-async def test_database_connection():
+async def test_database_connection(out=None):
     """Test database connection."""
     try:
-        from db import get_database, init_database
+        from db import init_database
+        _load_env()
         
-        print("Testing database connection...")
+        print("Testing database connection...", file=out)
         
         # Initialize database
-        await init_database()
-        print("✓ Database initialized successfully")
+        db = await init_database()
+        print("✓ Database initialized successfully", file=out)
         
-        # Test connection
-        db = await get_database()
-        await db.execute("SELECT 1")
-        print("✓ Database connection test successful")
+        # Test connection, reusing the connection init_database pooled
+        try:
+            await db.ping()
+        finally:
+            await db.dispose()
+        print("✓ Database connection test successful", file=out)
         
     except Exception as e:
-        print(f"✗ Database connection failed: {e}")
-        print("\nTroubleshooting tips:")
-        print("1. Make sure PostgreSQL is running")
-        print("2. Check your DATABASE_URL in .env file")
-        print("3. Ensure the database exists")
-        print("4. Verify your credentials")
+        print(f"✗ Database connection failed: {e}", file=out)
+        print("\nTroubleshooting tips:", file=out)
+        print("1. Make sure PostgreSQL is running", file=out)
+        print("2. Check your DATABASE_URL in .env file", file=out)
+        print("3. Ensure the database exists", file=out)
+        print("4. Verify your credentials", file=out)
         return False
     
     return True
 
-def test_gemini_connection():
+def test_gemini_connection(out=None):
     """Test Gemini API connection."""
     try:
-        from gemini_utils import GeminiClient
+        from gemini_utils import get_gemini_client
         
-        print("Testing Gemini API connection...")
+        print("Testing Gemini API connection...", file=out)
         
         # Load API key from environment
-        import os
-        from dotenv import load_dotenv
-        load_dotenv()
+        _load_env()
         
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
-            print("✗ GEMINI_API_KEY not found in environment")
+            print("✗ GEMINI_API_KEY not found in environment", file=out)
             return False
         
-        client = GeminiClient(api_key)
-        # Test with a simple profile analysis
-        result = client.analyze_profile(
-            bio="Test bio for API testing",
-            post_captions=["Test caption for API testing"]
-        )
+        # Shared client: genai is configured once and its channel is reused
+        client = get_gemini_client()
+        # Send the fixed probe prompt straight to the model: the analysis
+        # helpers retry with backoff and hide failures behind fallback results
+        result = client.model.generate_content(PROBE_PROMPT).text
         
         if result:
-            print("✓ Gemini API connection test successful")
+            print("✓ Gemini API connection test successful", file=out)
             return True
         else:
-            print("✗ Gemini API returned empty result")
+            print("✗ Gemini API returned empty result", file=out)
             return False
             
     except Exception as e:
-        print(f"✗ Gemini API connection failed: {e}")
-        print("\nTroubleshooting tips:")
-        print("1. Check your GEMINI_API_KEY in .env file")
-        print("2. Ensure you have internet connection")
-        print("3. Verify your API key is valid")
+        print(f"✗ Gemini API connection failed: {e}", file=out)
+        print("\nTroubleshooting tips:", file=out)
+        print("1. Check your GEMINI_API_KEY in .env file", file=out)
+        print("2. Ensure you have internet connection", file=out)
+        print("3. Verify your API key is valid", file=out)
         return False
 
-async def main():
+async def main(interactive=True, config=None):
     """Main setup function."""
+    import asyncio  # Already loaded by whoever runs this coroutine
+    
     print("🚀 Instagram Trend Suggester Setup")
     print("=" * 40)
     
+    # Read every setting up front so create_env_file needs no prompts
+    if config == "-":
+        # One read of the whole block, off the event loop; stdin is used up
+        loop = asyncio.get_running_loop()
+        _read_config(await loop.run_in_executor(None, sys.stdin.read))
+        interactive = False
+    elif config:
+        _read_config(Path(config).read_text())
+    
     # Step 1: Create .env file
-    create_env_file()
+    if not create_env_file(interactive):
+        sys.exit(1)
     print()
     
-    # Step 2: Test database connection
-    db_success = await test_database_connection()
-    print()
+    # Steps 2 and 3: Test the database and Gemini API connections together.
+    # The Gemini client is blocking, so it runs in a worker thread, and each
+    # probe writes to its own buffer so the output stays in order.
+    db_output, gemini_output = io.StringIO(), io.StringIO()
+    loop = asyncio.get_running_loop()
+    db_success, gemini_success = await asyncio.gather(
+        test_database_connection(db_output),
+        loop.run_in_executor(None, test_gemini_connection, gemini_output)
+    )
     
-    # Step 3: Test Gemini API connection
-    gemini_success = test_gemini_connection()
-    print()
+    # Probe results and the summary are written to the terminal in one go
+    report = io.StringIO()
+    print(db_output.getvalue(), file=report)
+    print(gemini_output.getvalue(), file=report)
     
     # Summary
-    print("Setup Summary:")
-    print("=" * 40)
-    print(f"✓ Environment file created")
-    print(f"{'✓' if db_success else '✗'} Database connection")
-    print(f"{'✓' if gemini_success else '✗'} Gemini API connection")
+    print("Setup Summary:", file=report)
+    print("=" * 40, file=report)
+    print(f"✓ Environment file created", file=report)
+    print(f"{'✓' if db_success else '✗'} Database connection", file=report)
+    print(f"{'✓' if gemini_success else '✗'} Gemini API connection", file=report)
     
     if db_success and gemini_success:
-        print("\n🎉 Setup completed successfully!")
-        print("\nNext steps:")
-        print("1. Run the application: python main.py")
-        print("2. Open http://localhost:8000/docs to see the API documentation")
-        print("3. Try the /analyze-profile endpoint with an Instagram username")
+        print("\n🎉 Setup completed successfully!", file=report)
+        print("\nNext steps:", file=report)
+        print("1. Run the application: python main.py", file=report)
+        print("2. Open http://localhost:8000/docs to see the API documentation", file=report)
+        print("3. Try the /analyze-profile endpoint with an Instagram username", file=report)
     else:
-        print("\n⚠️  Some components need attention. Please fix the issues above.")
+        print("\n⚠️  Some components need attention. Please fix the issues above.", file=report)
+    
+    print(f"\nProject files are located in: {project_dir}", file=report)
     
-    print(f"\nProject files are located in: {project_dir}")
+    sys.stdout.write(report.getvalue())
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Only needed when run as a script, so importing this module stays cheap
+    import argparse
+    try:
+        from uvloop import run  # libuv event loop, where installed (not on Windows)
+    except ImportError:
+        from asyncio import run
+    
+    parser = argparse.ArgumentParser(description="Configure and verify the Instagram Trend Suggester")
+    parser.add_argument(
+        "--non-interactive",
+        action="store_true",
+        help="never prompt; take settings from GEMINI_API_KEY, DATABASE_URL and DB_CHOICE"
+    )
+    parser.add_argument(
+        "--config",
+        metavar="FILE",
+        help="read settings as KEY=VALUE lines (GEMINI_API_KEY, DATABASE_URL, DB_CHOICE, "
+             "DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME) from FILE, or from stdin with '-'"
+    )
+    args = parser.parse_args()
+    run(main(
+        interactive=not args.non_interactive and sys.stdin.isatty(),
+        config=args.config
+    ))
@@ -3,62 +3,86 @@
 Simple test script to verify the Instagram Trend Suggester setup
 """
 
+import asyncio
+import contextlib
+import functools
+import io
+from importlib import metadata
+import subprocess
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import json
+from pathlib import Path
 
-def test_imports():
-    """Test if all required modules can be imported"""
-    print("Testing imports...")
-    
-    try:
-        import fastapi
-        print("✓ FastAPI")
-    except ImportError:
-        print("✗ FastAPI - run: pip install fastapi")
-        return False
-    
-    try:
-        import uvicorn
-        print("✓ Uvicorn")
-    except ImportError:
-        print("✗ Uvicorn - run: pip install uvicorn")
-        return False
-    
-    try:
-        import sqlalchemy
-        print("✓ SQLAlchemy")
-    except ImportError:
-        print("✗ SQLAlchemy - run: pip install sqlalchemy")
-        return False
-    
-    try:
-        import psycopg2
-        print("✓ psycopg2")
-    except ImportError:
-        print("✗ psycopg2 - run: pip install psycopg2-binary")
-        return False
-    
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib parser when orjson is unavailable
+    orjson = None
+
+# Resolved once so the checks work from any working directory
+PROJECT_DIR = Path(__file__).resolve().parent
+ENV_FILE = PROJECT_DIR / ".env"
+MOCK_FILE = PROJECT_DIR / "mock_data" / "trending.json"
+
+# Make the project modules importable, once even if re-imported
+if str(PROJECT_DIR) not in sys.path:
+    sys.path.append(str(PROJECT_DIR))
+
+@functools.lru_cache(maxsize=1)
+def _load_env():
+    """Load .env into the environment once per run"""
+    from dotenv import load_dotenv
+    return load_dotenv(ENV_FILE)
+
+# (module, label, pip distribution, needs a real import) for each entry in
+# requirements.txt; native extensions are loaded to prove they match this Python
+REQUIRED_MODULES = [
+    ("fastapi", "FastAPI", "fastapi", False),
+    ("uvicorn", "Uvicorn", "uvicorn", False),
+    ("pydantic", "Pydantic", "pydantic", False),
+    ("google.generativeai", "Google Generative AI", "google-generativeai", False),
+    ("apscheduler", "APScheduler", "apscheduler", False),
+    ("instaloader", "Instaloader", "instaloader", False),
+    ("dotenv", "python-dotenv", "python-dotenv", False),
+    ("sqlalchemy", "SQLAlchemy", "sqlalchemy", False),
+    ("asyncpg", "asyncpg", "asyncpg", True),
+    ("aiosqlite", "aiosqlite", "aiosqlite", False),
+    ("httpx", "HTTPX", "httpx", False),
+    ("cachetools", "cachetools", "cachetools", False),
+    ("orjson", "orjson", "orjson", True),
+]
+
+def _module_available(name, package, load=False):
+    """Check that a dependency is installed without importing it into this process"""
+    # Only reads the distribution's metadata; no module code runs
     try:
-        import google.generativeai
-        print("✓ Google Generative AI")
-    except ImportError:
-        print("✗ Google Generative AI - run: pip install google-generativeai")
+        metadata.distribution(package)
+    except metadata.PackageNotFoundError:
         return False
-    
+    if not load:
+        return True
+    # Import in a child interpreter so a broken extension cannot crash the checks
+    result = subprocess.run([sys.executable, "-c", f"import {name}"], capture_output=True)
+    return result.returncode == 0
+
+def _run_buffered(test):
+    """Run a check with its output collected and written to the terminal in one go"""
+    output = io.StringIO()
     try:
-        import instaloader
-        print("✓ Instaloader")
-    except ImportError:
-        print("✗ Instaloader - run: pip install instaloader")
-        return False
+        with contextlib.redirect_stdout(output):
+            return test()
+    finally:
+        sys.stdout.write(output.getvalue())
+
+def test_imports():
+    """Test if all required modules can be imported"""
+    print("Testing imports...")
     
-    try:
-        import apscheduler
-        print("✓ APScheduler")
-    except ImportError:
-        print("✗ APScheduler - run: pip install apscheduler")
-        return False
+    for module, label, package, load in REQUIRED_MODULES:
+        if not _module_available(module, package, load):
+            print(f"✗ {label} - run: pip install {package}")
+            return False
+        print(f"✓ {label}")
     
     return True
 
@@ -66,15 +90,15 @@ def test_env_file():
     """Test if .env file exists and has required variables"""
     print("\nTesting environment configuration...")
     
-    if not os.path.exists('.env'):
+    if not ENV_FILE.is_file():
         print("✗ .env file not found")
         print("  Please copy .env.example to .env and configure your API keys")
         return False
     
     print("✓ .env file exists")
     
-    from dotenv import load_dotenv
-    load_dotenv()
+    # Parsed once; the database checks below reuse the same load
+    _load_env()
     
     gemini_key = os.getenv('GEMINI_API_KEY')
     db_url = os.getenv('DATABASE_URL')
@@ -97,15 +121,13 @@ def test_mock_data():
     """Test if mock data file exists"""
     print("\nTesting mock data...")
     
-    mock_file = os.path.join('mock_data', 'trending.json')
-    if not os.path.exists(mock_file):
+    if not MOCK_FILE.is_file():
         print("✗ Mock data file not found")
         return False
     
     try:
-        import json
-        with open(mock_file, 'r') as f:
-            data = json.load(f)
+        raw = MOCK_FILE.read_bytes()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
         
         if 'trends' in data and len(data['trends']) > 0:
             print(f"✓ Mock data loaded ({len(data['trends'])} trends)")
@@ -117,19 +139,44 @@ def test_mock_data():
         print(f"✗ Error reading mock data: {e}")
         return False
 
+def test_database_url_options():
+    """Test that the configured DATABASE_URL only uses options the async driver accepts"""
+    print("\nTesting database URL options...")
+    
+    _load_env()
+    db_url = os.getenv('DATABASE_URL')
+    if not db_url:
+        print("⚠ DATABASE_URL not set, skipping")
+        return True
+    
+    try:
+        from db import _async_url
+        _async_url(db_url)
+    except Exception as e:
+        print(f"✗ {e}")
+        return False
+    
+    print("✓ DATABASE_URL options supported")
+    return True
+
 def test_database_connection():
     """Test database connection (optional)"""
     print("\nTesting database connection...")
     
     try:
-        from dotenv import load_dotenv
-        load_dotenv()
+        _load_env()
         
         from db import get_database
         db = get_database()
         
-        # Try to create tables
-        db.create_tables()
+        # Try to create tables, closing the pool before the event loop ends
+        async def create_tables():
+            try:
+                await db.create_tables()
+            finally:
+                await db.dispose()
+        
+        asyncio.run(create_tables())
         print("✓ Database connection successful")
         print("✓ Tables created/verified")
         return True
@@ -149,20 +196,24 @@ def main():
     
     # Required tests
     total_tests += 1
-    if test_imports():
+    if _run_buffered(test_imports):
+        tests_passed += 1
+    
+    total_tests += 1
+    if _run_buffered(test_env_file):
         tests_passed += 1
     
     total_tests += 1
-    if test_env_file():
+    if _run_buffered(test_mock_data):
         tests_passed += 1
     
     total_tests += 1
-    if test_mock_data():
+    if _run_buffered(test_database_url_options):
         tests_passed += 1
     
     # Optional test
     total_tests += 1
-    if test_database_connection():
+    if _run_buffered(test_database_connection):
         tests_passed += 1
     
     print("\n" + "=" * 50)
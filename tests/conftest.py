@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The app modules are imported top-level (from db import ...), as main.py does
+PROJECT_DIR = Path(__file__).resolve().parent.parent / "insta_trend_suggester"
+if str(PROJECT_DIR) not in sys.path:
+    sys.path.insert(0, str(PROJECT_DIR))